@@ -1,26 +1,43 @@
 #!/usr/bin/env python3
 # pdf_processor.py - Processes PDFs for RAG system
 
+import io
 import os
+import hashlib
+import itertools
+import re
 import json
 import time
 import tempfile
 import logging
-from typing import List, Dict, Any, Tuple
+import multiprocessing
+import threading
+from collections import deque
+from multiprocessing.managers import BaseManager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, BinaryIO, Optional, Tuple, Union
+
+import numpy as np
+import orjson
+from numba import njit
 
 # Kafka imports
-from kafka import KafkaConsumer, KafkaProducer
+from confluent_kafka import Consumer, Producer, TopicPartition, KafkaException
 
 # Google Cloud imports
 from google.cloud import storage
-import google.generativeai as genai
+from google.cloud.storage import transfer_manager
+from google import genai
+from google.genai import types
 
 # Pinecone imports
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import ServerlessSpec
+from pinecone.exceptions import NotFoundException
+from pinecone.grpc import PineconeGRPC
 
 # PDF processing imports
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
 
 # Configure logging
 logging.basicConfig(
@@ -29,12 +46,238 @@ logging.basicConfig(
 )
 logger = logging.getLogger("pdf-processor")
 
+# Embedding configuration
+EMBEDDING_DIMENSION = 768
+# Below this many chunks the batch job overhead outweighs its benefits
+BATCH_API_MIN_CHUNKS = 8
+# Maximum number of texts per synchronous embedding request
+EMBED_REQUEST_MAX_TEXTS = 100
+# Timeout for individual Gemini API requests
+GEMINI_TIMEOUT_MS = 60_000
+# Upper bound on how long to wait for a batch embedding job before falling back
+BATCH_JOB_TIMEOUT_SECONDS = int(os.environ.get("GEMINI_BATCH_TIMEOUT_SECONDS", "1800"))
+# Gemini embedding quotas (free tier defaults) and retries per rate-limited request
+GEMINI_RPM = int(os.environ.get("GEMINI_RPM", "100"))
+GEMINI_TPM = int(os.environ.get("GEMINI_TPM", "30000"))
+EMBED_MAX_ATTEMPTS = 4
+
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s")
+
+# PDFs up to this size are downloaded into memory; larger ones are written to
+# a temporary file with parallel range requests
+CHUNKED_DOWNLOAD_THRESHOLD = 16 * 1024 * 1024
+CHUNKED_DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_DOWNLOAD_WORKERS = 8
+
+# Number of vectors per Pinecone upsert request
+UPSERT_BATCH_SIZE = 100
+
+# Number of worker processes and how often a PDF is retried on its own after
+# its worker process died before the PDF is reported as failed
+WORKER_COUNT = os.cpu_count()
+MAX_PDF_ATTEMPTS = 3
+KEEPALIVE_POLL_SECONDS = 1.0  # How often the consumer is polled while a batch is processed
+
+# Maximum number of messages returned by one consume() call
+CONSUME_BATCH_SIZE = 500
+
+# Chunking configuration - smaller chunks for better retrieval precision
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+
+# Boundaries in order of preference, like LangChain's separators: sentences
+# and paragraphs, then lines, then words. Chunks start at the end of a match.
+_SENT_RE = re.compile(r'(?<=[.!?])\s+|\n\n+')
+_LINE_RE = re.compile(r'\n+')
+_WORD_RE = re.compile(r'\s+')
+
+
+@njit(cache=True)
+def _last_boundary(offsets: np.ndarray, start: int, limit: int) -> int:
+    """Return the furthest offset in (start, limit], or start if there is none."""
+    i = np.searchsorted(offsets, limit, side="right") - 1
+    if i >= 0 and offsets[i] > start:
+        return offsets[i]
+    return start
+
+
+@njit(cache=True)
+def _first_boundary(offsets: np.ndarray, lower: int, end: int) -> int:
+    """Return the first offset in [lower, end), or end if there is none."""
+    i = np.searchsorted(offsets, lower, side="left")
+    if i < offsets.shape[0] and offsets[i] < end:
+        return offsets[i]
+    return end
+
+
+@njit(cache=True)
+def _window_spans(sentences: np.ndarray, lines: np.ndarray, words: np.ndarray, text_len: int,
+                  size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> np.ndarray:
+    """Group boundary offsets into windows of at most `size` characters.
+    
+    Each window ends at the furthest sentence boundary that fits, falling back
+    to the furthest line break and then the furthest word break. The next
+    window starts at the first boundary of the same kind within `overlap`
+    characters of that end. Text without any fitting boundary is cut at `size`
+    with a plain `overlap`.
+    
+    Args:
+        sentences: Ascending int64 sentence boundary offsets, ending with text_len
+        lines: Ascending int64 line break offsets
+        words: Ascending int64 word break offsets
+        text_len: Length of the text being split
+        size: Maximum window length
+        overlap: Maximum overlap between consecutive windows
+        
+    Returns:
+        Int64 array of shape (N, 2) with the (start, end) of each window
+    """
+    # Every window advances the start by at least one character
+    spans = np.empty((text_len + 1, 2), dtype=np.int64)
+    count = 0
+    start = 0
+    while start < text_len:
+        limit = min(start + size, text_len)
+        boundaries = sentences
+        end = _last_boundary(sentences, start, limit)
+        if end == start:
+            boundaries = lines
+            end = _last_boundary(lines, start, limit)
+        if end == start:
+            boundaries = words
+            end = _last_boundary(words, start, limit)
+        hard_cut = end == start
+        if hard_cut:
+            end = limit
+        
+        spans[count, 0] = start
+        spans[count, 1] = end
+        count += 1
+        if end >= text_len:
+            break
+        
+        lower = max(end - overlap, start + 1)
+        if hard_cut:
+            start = lower
+        else:
+            start = _first_boundary(boundaries, lower, end)
+    return spans[:count]
+
+
+def _boundaries(pattern: re.Pattern, text: str, *extra: int) -> np.ndarray:
+    """Return the end offsets of all matches of pattern as an int64 array."""
+    return np.fromiter(
+        itertools.chain((m.end() for m in pattern.finditer(text)), extra),
+        dtype=np.int64
+    )
+
+
+def fast_split(text: str, page_index: int = 0) -> List[Tuple[int, str]]:
+    """Split text into overlapping chunks along sentence, line and word boundaries.
+    
+    Args:
+        text: Text to split
+        page_index: Page number attached to every chunk
+        
+    Returns:
+        List of (page_index, chunk_text) tuples
+    """
+    spans = _window_spans(
+        _boundaries(_SENT_RE, text, len(text)),
+        _boundaries(_LINE_RE, text),
+        _boundaries(_WORD_RE, text),
+        len(text)
+    )
+    chunks = []
+    for start, end in spans.tolist():
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append((page_index, chunk))
+    return chunks
+
+
+class _RateLimiter:
+    """Sliding-window limiter for requests-per-minute and tokens-per-minute quotas.
+    
+    acquire() sleeps only until the earliest moment a request fits in both
+    windows. After a rate limit response the request allowance is lowered and
+    recovers by one for every request that succeeds afterwards.
+    
+    The quotas belong to the API key, so worker processes share one instance
+    served by _RateLimiterManager; its methods are thread-safe because the
+    manager serves each worker on its own thread.
+    """
+    
+    def __init__(self, rpm: int, tpm: int, window: float = 60.0):
+        self.max_rpm = rpm
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._requests = deque()  # (timestamp, tokens) of requests in the window
+        self._window_tokens = 0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+    
+    def _expire(self, now: float):
+        while self._requests and now - self._requests[0][0] >= self.window:
+            _, tokens = self._requests.popleft()
+            self._window_tokens -= tokens
+    
+    def acquire(self, tokens: int):
+        """Block until a request using `tokens` input tokens can be sent."""
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if len(self._requests) < self.rpm and self._window_tokens + tokens <= self.tpm:
+                        self._requests.append((now, tokens))
+                        self._window_tokens += tokens
+                        return
+                    # Wait for the oldest request to leave the window
+                    wait = self._requests[0][0] + self.window - now
+            time.sleep(max(wait, 0.01))
+    
+    def record_success(self):
+        """Let the request allowance recover after a rate limit."""
+        with self._lock:
+            if self.rpm < self.max_rpm:
+                self.rpm += 1
+    
+    def record_rate_limit(self, retry_after: Optional[float] = None):
+        """Back off after a rate limit response.
+        
+        Args:
+            retry_after: Delay suggested by the server in seconds, if any
+        """
+        with self._lock:
+            self.rpm = max(1, int(self.rpm * 0.75))
+            delay = retry_after if retry_after is not None else self.window / self.rpm
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+
+
+class _RateLimiterManager(BaseManager):
+    """Manager process serving the _RateLimiter shared by all worker processes."""
+
+
+_RateLimiterManager.register("RateLimiter", _RateLimiter)
+
+
 class PDFProcessor:
     """PDF Processor for RAG system that uses Kafka, Gemini, and Pinecone."""
     
         
-    def __init__(self):
-        """Initialize the PDF processor with all necessary clients and configurations."""
+    def __init__(self, with_kafka: bool = True, limiter: Optional[_RateLimiter] = None):
+        """Initialize the PDF processor with all necessary clients and configurations.
+        
+        Args:
+            with_kafka: Whether to create the Kafka consumer and producer. Worker
+                processes only process PDFs and skip them.
+            limiter: Gemini rate limiter shared with other processes; a private
+                one is created if not given
+        """
         # Initialize GCS client - with Workload Identity, no explicit credentials needed
         self.storage_client = storage.Client()
         self.bucket_name = os.environ.get("GCS_BUCKET_NAME")
@@ -47,8 +290,14 @@ class PDFProcessor:
         gemini_api_key = os.environ.get("GEMINI_API_KEY")
         if not gemini_api_key:
             raise ValueError("GEMINI_API_KEY environment variable not set")
-        genai.configure(api_key=gemini_api_key)
-        self.embedding_model = "models/embedding-001"  # Latest Gemini embedding model
+        # One long-lived client per process so its HTTP connection pool is
+        # reused across embedding requests instead of reconnecting per call
+        self.genai_client = genai.Client(
+            api_key=gemini_api_key,
+            http_options=types.HttpOptions(timeout=GEMINI_TIMEOUT_MS)
+        )
+        self.embedding_model = "gemini-embedding-001"  # Supported by the Batch API
+        self.limiter = limiter if limiter is not None else _RateLimiter(GEMINI_RPM, GEMINI_TPM)
         
         # # Initialize Pinecone
         # pinecone_api_key = os.environ.get("PINECONE_API_KEY")
@@ -56,19 +305,20 @@ class PDFProcessor:
         #     raise ValueError("PINECONE_API_KEY environment variable not set")
         # pinecone.init(api_key=pinecone_api_key)
 
-        # Initialize Pinecone v3 client
+        # Initialize Pinecone v3 gRPC client
         pinecone_api_key = os.environ.get("PINECONE_API_KEY")
         if not pinecone_api_key:
             raise ValueError("PINECONE_API_KEY environment variable not set")
-        self.pc = Pinecone(api_key=pinecone_api_key)
+        self.pc = PineconeGRPC(api_key=pinecone_api_key)
         
         # Initialize Kafka
         self.kafka_bootstrap_servers = os.environ.get(
             "KAFKA_BOOTSTRAP_SERVERS", 
             "kafka-controller-headless.kafka.svc.cluster.local:9092"
         )
-        self.consumer = self._initialize_kafka_consumer()
-        self.producer = self._initialize_kafka_producer()
+        if with_kafka:
+            self.consumer = self._initialize_kafka_consumer()
+            self.producer = self._initialize_kafka_producer()
         
         # Initialize index
         self.index_name = "pdf-embeddings"
@@ -80,23 +330,25 @@ class PDFProcessor:
     def _initialize_pinecone_index(self):
         """Initialize Pinecone index, creating it if it doesn't exist."""
         try:
-            # Check if index exists in Pinecone v3
-            index_list = [index.name for index in self.pc.list_indexes()]
-            
-            if self.index_name not in index_list:
+            # Look the index up directly instead of listing all indexes; its
+            # host lets the data plane client skip another control plane call
+            try:
+                index_host = self.pc.describe_index(self.index_name).host
+            except NotFoundException:
                 logger.info(f"Creating new Pinecone index: {self.index_name}")
                 # Create a serverless index with free tier settings for GCP
                 self.pc.create_index(
                     name=self.index_name,
-                    dimension=768,  # Dimension for Gemini embeddings
+                    dimension=EMBEDDING_DIMENSION,  # Dimension for Gemini embeddings
                     metric="cosine",
                     spec=ServerlessSpec(
                         cloud="gcp",
                         region="us-east-1-aws"  # Free tier is in GCP us-east-1
                     )
                 )
+                index_host = self.pc.describe_index(self.index_name).host
             
-            index = self.pc.Index(self.index_name)
+            index = self.pc.Index(self.index_name, host=index_host)
             logger.info(f"Connected to Pinecone index: {self.index_name}")
             return index
         except Exception as e:
@@ -107,19 +359,23 @@ class PDFProcessor:
     def _initialize_kafka_consumer(self):
         """Initialize and configure the Kafka consumer."""
         try:
-            consumer = KafkaConsumer(
-                'pdf-uploads',
-                bootstrap_servers=self.kafka_bootstrap_servers,
-                auto_offset_reset='earliest',
-                group_id='pdf-processor',
-                enable_auto_commit=True,
-                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
-                # Optimized consumer configurations for performance
-                fetch_max_wait_ms=500,
-                fetch_min_bytes=1,
-                fetch_max_bytes=52428800,  # 50MB max fetch
-                max_partition_fetch_bytes=10485760  # 10MB per partition
-            )
+            fetch_max_bytes = 104857600  # 100MB max fetch
+            consumer = Consumer({
+                'bootstrap.servers': self.kafka_bootstrap_servers,
+                'group.id': 'pdf-processor',
+                'auto.offset.reset': 'earliest',
+                'enable.auto.commit': False,  # Offsets are committed per processed batch
+                # Optimized consumer configurations for performance: wait for
+                # a larger fetch so bursts of uploads arrive in fewer round trips
+                'fetch.wait.max.ms': 200,
+                'fetch.min.bytes': 65536,
+                'fetch.max.bytes': fetch_max_bytes,
+                'receive.message.max.bytes': fetch_max_bytes + 512,  # Must exceed fetch.max.bytes
+                'max.partition.fetch.bytes': 4194304,  # 4MB per partition
+                'queued.max.messages.kbytes': 65536,  # 64MB prefetch queue
+                'fetch.queue.backoff.ms': 10
+            })
+            consumer.subscribe(['pdf-uploads'])
             logger.info(f"Kafka consumer initialized with bootstrap servers: {self.kafka_bootstrap_servers}")
             return consumer
         except Exception as e:
@@ -129,22 +385,181 @@ class PDFProcessor:
     def _initialize_kafka_producer(self):
         """Initialize and configure the Kafka producer."""
         try:
-            producer = KafkaProducer(
-                bootstrap_servers=self.kafka_bootstrap_servers,
-                value_serializer=lambda m: json.dumps(m).encode('utf-8'),
-                # Optimized producer settings
-                batch_size=16384,
-                linger_ms=100,
-                buffer_memory=33554432  # 32MB buffer
-            )
+            producer = Producer({
+                'bootstrap.servers': self.kafka_bootstrap_servers,
+                # Optimized producer settings - status messages are not latency
+                # critical, so linger longer and compress whole batches
+                'batch.size': 16384,
+                'linger.ms': 250,
+                'compression.type': 'lz4',
+                'acks': 1,  # Leader acknowledgement only
+                'queue.buffering.max.kbytes': 32768  # 32MB buffer
+            })
             logger.info(f"Kafka producer initialized with bootstrap servers: {self.kafka_bootstrap_servers}")
             return producer
         except Exception as e:
             logger.error(f"Failed to initialize Kafka producer: {str(e)}")
             raise
     
-    def generate_embeddings(self, texts: List[str], batch_size: int = 16) -> List[List[float]]:
-        """Generate embeddings using Gemini API with batching.
+    def _send_status(self, status: Dict[str, Any]):
+        """Queue a status message on the pdf-processing-status topic."""
+        self.producer.produce(
+            'pdf-processing-status',
+            orjson.dumps(status),
+            callback=_delivery_report
+        )
+        # Serve delivery callbacks for earlier messages
+        self.producer.poll(0)
+    
+    def generate_embeddings(self, texts: List[str], batch_size: int = EMBED_REQUEST_MAX_TEXTS) -> List[List[float]]:
+        """Generate embeddings using the Gemini Batch API.
+        
+        Small jobs are embedded synchronously since batch job latency dominates for them.
+        If the batch job fails or times out, the synchronous path is used as a fallback.
+        
+        Args:
+            texts: List of text chunks to embed
+            batch_size: Number of texts per request on the synchronous path
+            
+        Returns:
+            List of embedding vectors
+        """
+        if len(texts) < BATCH_API_MIN_CHUNKS:
+            return self._generate_embeddings_sync(texts, batch_size)
+        
+        try:
+            return self._generate_embeddings_batch(texts)
+        except Exception as e:
+            logger.error(f"Batch embedding job failed, falling back to synchronous requests: {str(e)}")
+            return self._generate_embeddings_sync(texts, batch_size)
+    
+    def _generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with a single asynchronous Gemini batch job."""
+        # Write one embedding request per chunk to a JSONL file
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as requests_file:
+            requests_path = requests_file.name
+            for i, text in enumerate(texts):
+                requests_file.write(json.dumps({
+                    "key": f"chunk_{i}",
+                    "request": {
+                        "content": {"parts": [{"text": text}]},
+                        "task_type": "RETRIEVAL_DOCUMENT",
+                        "output_dimensionality": EMBEDDING_DIMENSION
+                    }
+                }) + "\n")
+        
+        try:
+            uploaded_file = self.genai_client.files.upload(
+                file=requests_path,
+                config=types.UploadFileConfig(display_name="pdf-embedding-requests", mime_type="jsonl")
+            )
+        finally:
+            os.remove(requests_path)
+        
+        try:
+            batch_job = self.genai_client.batches.create_embeddings(
+                model=self.embedding_model,
+                src={"file_name": uploaded_file.name},
+                config={"display_name": "pdf-embeddings"}
+            )
+            logger.info(f"Submitted batch embedding job {batch_job.name} for {len(texts)} chunks")
+            
+            # Poll with exponential backoff until the job reaches a terminal state
+            delay = 2
+            deadline = time.monotonic() + BATCH_JOB_TIMEOUT_SECONDS
+            while batch_job.state.name not in (
+                "JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"
+            ):
+                if time.monotonic() > deadline:
+                    self.genai_client.batches.cancel(name=batch_job.name)
+                    raise TimeoutError(f"Batch embedding job {batch_job.name} did not finish in time")
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+                batch_job = self.genai_client.batches.get(name=batch_job.name)
+        finally:
+            # The request file is no longer needed once the job has finished
+            self._delete_gemini_file(uploaded_file.name)
+        
+        if batch_job.state.name != "JOB_STATE_SUCCEEDED":
+            raise RuntimeError(f"Batch embedding job {batch_job.name} ended in state {batch_job.state.name}")
+        
+        # Reassemble embeddings in key order
+        all_embeddings = [None] * len(texts)
+        result_file_name = batch_job.dest.file_name
+        try:
+            result_content = self.genai_client.files.download(file=result_file_name)
+        finally:
+            self._delete_gemini_file(result_file_name)
+        for line in result_content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            index = int(result["key"].rsplit("_", 1)[1])
+            values = result.get("response", {}).get("embedding", {}).get("values")
+            if values:
+                all_embeddings[index] = values
+            else:
+                logger.error(f"Batch embedding failed for {result['key']}: {result.get('error')}")
+        
+        # Retry chunks the job could not embed with synchronous requests, which
+        # raise if they fail too
+        missing = [i for i, embedding in enumerate(all_embeddings) if embedding is None]
+        if missing:
+            logger.info(f"Embedding {len(missing)} chunks missing from batch job {batch_job.name} synchronously")
+            retried = self._generate_embeddings_sync([texts[i] for i in missing])
+            for i, embedding in zip(missing, retried):
+                all_embeddings[i] = embedding
+        
+        logger.info(f"Batch embedding job {batch_job.name} completed")
+        return all_embeddings
+    
+    def _delete_gemini_file(self, file_name: str):
+        """Delete a file from the Gemini Files API, logging rather than raising on failure."""
+        try:
+            self.genai_client.files.delete(name=file_name)
+        except Exception as e:
+            logger.warning(f"Failed to delete Gemini file {file_name}: {str(e)}")
+    
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """Embed a single batch of texts with a synchronous Gemini request."""
+        embedding_results = self.genai_client.models.embed_content(
+            model=self.embedding_model,
+            contents=batch,
+            config=types.EmbedContentConfig(
+                task_type="RETRIEVAL_DOCUMENT",
+                output_dimensionality=EMBEDDING_DIMENSION
+            )
+        )
+        return [result.values for result in embedding_results.embeddings]
+    
+    def _embed_batch_with_retry(self, batch: List[str], batch_number: int) -> List[List[float]]:
+        """Embed a batch within the rate limits, retrying after rate limit responses.
+        
+        Raises:
+            RuntimeError: If the batch cannot be embedded
+        """
+        # Rough input token estimate of four characters per token
+        expected_tokens = sum(len(text) for text in batch) // 4
+        for attempt in range(1, EMBED_MAX_ATTEMPTS + 1):
+            self.limiter.acquire(expected_tokens)
+            try:
+                embeddings = self._embed_batch(batch)
+                self.limiter.record_success()
+                return embeddings
+            except Exception as e:
+                logger.error(f"Error generating embeddings for batch {batch_number}: {str(e)}")
+                error_text = str(e).lower()
+                if "rate limit" not in error_text and "resource_exhausted" not in error_text:
+                    raise RuntimeError(f"Failed to embed batch {batch_number}: {str(e)}") from e
+                retry_delay = _RETRY_DELAY_RE.search(str(e))
+                retry_after = float(retry_delay.group(1)) if retry_delay else None
+                logger.info(f"Rate limit hit on attempt {attempt}, backing off")
+                self.limiter.record_rate_limit(retry_after)
+        
+        raise RuntimeError(f"Failed to embed batch {batch_number}: still rate limited after {EMBED_MAX_ATTEMPTS} attempts")
+    
+    def _generate_embeddings_sync(self, texts: List[str], batch_size: int = EMBED_REQUEST_MAX_TEXTS) -> List[List[float]]:
+        """Generate embeddings using synchronous Gemini requests with batching.
         
         Args:
             texts: List of text chunks to embed
@@ -157,212 +572,434 @@ class PDFProcessor:
         
         for i in range(0, len(texts), batch_size):
             batch = texts[i:i + batch_size]
-            
+            all_embeddings.extend(self._embed_batch_with_retry(batch, i // batch_size))
+        
+        return all_embeddings
+    
+    def _build_vectors(self, pdf_id: str, texts: List[str], pages: List[int],
+                       embeddings: np.ndarray, start: int, end: int) -> List[Dict[str, Any]]:
+        """Build Pinecone records for chunks start..end from the parallel chunk arrays."""
+        # One array-to-list conversion per batch rather than per vector
+        batch_values = embeddings[start:end].tolist()
+        return [
+            {
+                "id": f"{pdf_id}-{i}",
+                "values": values,
+                "metadata": {"text": texts[i], "source": pdf_id, "page": pages[i]}
+            }
+            for i, values in zip(range(start, end), batch_values)
+        ]
+    
+    def _upsert_vectors(self, pdf_id: str, texts: List[str], pages: List[int], embeddings: np.ndarray):
+        """Upsert chunk vectors to Pinecone with concurrent batch requests.
+        
+        Records are built lazily per batch. All batches are sent at once over
+        gRPC. Batches rejected by a rate limit are retried sequentially in
+        smaller batches.
+        
+        Raises:
+            RuntimeError: If any vectors could not be upserted
+        
+        Args:
+            pdf_id: Unique ID for the PDF
+            texts: Chunk texts
+            pages: Page number of each chunk
+            embeddings: Float32 array of shape (len(texts), EMBEDDING_DIMENSION)
+        """
+        ranges = [
+            (start, min(start + UPSERT_BATCH_SIZE, len(texts)))
+            for start in range(0, len(texts), UPSERT_BATCH_SIZE)
+        ]
+        async_results = [
+            self.index.upsert(
+                vectors=self._build_vectors(pdf_id, texts, pages, embeddings, start, end),
+                async_req=True
+            )
+            for start, end in ranges
+        ]
+        
+        failed_vectors = 0
+        for batch_number, ((start, end), async_result) in enumerate(zip(ranges, async_results), start=1):
             try:
-                embedding_results = genai.embed_content(
-                    model=self.embedding_model,
-                    content=batch,
-                    task_type="retrieval_document"
-                )
-                batch_embeddings = [result.embedding for result in embedding_results.embeddings]
-                all_embeddings.extend(batch_embeddings)
-                
-                # Free tier rate limit protection - add a small delay between batches
-                if i + batch_size < len(texts):
-                    time.sleep(0.5)
-                    
+                async_result.result()
+                logger.info(f"Upserted batch {batch_number}/{len(ranges)}")
             except Exception as e:
-                logger.error(f"Error generating embeddings for batch {i//batch_size}: {str(e)}")
-                # If we hit a rate limit, wait longer and retry
-                if "rate limit" in str(e).lower():
+                logger.error(f"Error upserting batch {batch_number}: {str(e)}")
+                # If we hit a rate limit, wait longer and retry with smaller batches
+                error_text = str(e).lower()
+                if "limit" not in error_text and "resource_exhausted" not in error_text:
+                    failed_vectors += end - start
+                else:
                     logger.info("Rate limit hit, waiting 5 seconds before retrying")
                     time.sleep(5)
-                    # Retry with a smaller batch size
-                    smaller_batch = batch[:max(1, len(batch)//2)]
-                    try:
-                        embedding_results = genai.embed_content(
-                            model=self.embedding_model,
-                            content=smaller_batch,
-                            task_type="retrieval_document"
+                    smaller_batch_size = UPSERT_BATCH_SIZE // 2
+                    for j in range(start, end, smaller_batch_size):
+                        smaller_batch = self._build_vectors(
+                            pdf_id, texts, pages, embeddings, j, min(j + smaller_batch_size, end)
                         )
-                        batch_embeddings = [result.embedding for result in embedding_results.embeddings]
-                        all_embeddings.extend(batch_embeddings)
-                        
-                        # Process the remaining half
-                        if len(batch) > len(smaller_batch):
-                            time.sleep(1)  # Wait a bit longer
-                            remaining_batch = batch[len(smaller_batch):]
-                            embedding_results = genai.embed_content(
-                                model=self.embedding_model,
-                                content=remaining_batch,
-                                task_type="retrieval_document"
-                            )
-                            batch_embeddings = [result.embedding for result in embedding_results.embeddings]
-                            all_embeddings.extend(batch_embeddings)
-                    except Exception as retry_error:
-                        logger.error(f"Failed retry for batch {i//batch_size}: {str(retry_error)}")
-                        # Return empty embeddings for this batch
-                        all_embeddings.extend([[0] * 768] * len(batch))
-                else:
-                    # For other errors, return empty embeddings
-                    all_embeddings.extend([[0] * 768] * len(batch))
+                        try:
+                            self.index.upsert(vectors=smaller_batch)
+                            logger.info(f"Upserted smaller batch {(j - start)//smaller_batch_size + 1} of batch {batch_number}")
+                        except Exception as retry_error:
+                            logger.error(f"Failed retry for smaller batch: {str(retry_error)}")
+                            failed_vectors += len(smaller_batch)
         
-        return all_embeddings
+        if failed_vectors:
+            raise RuntimeError(f"Failed to upsert {failed_vectors} of {len(texts)} vectors")
     
-    def process_pdf(self, pdf_path: str, pdf_id: str):
+    def process_pdf(self, pdf_source: Union[str, BinaryIO], pdf_id: str):
         """Process a PDF file, generate embeddings, and store in Pinecone.
         
         Args:
-            pdf_path: Path to the downloaded PDF file
+            pdf_source: Path to the downloaded PDF file or a file-like object with its contents
             pdf_id: Unique ID for the PDF
             
         Returns:
             Number of chunks processed
         """
-        logger.info(f"Processing PDF: {pdf_path} (ID: {pdf_id})")
-        
-        # Load PDF
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
+        logger.info(f"Processing PDF: {pdf_source if isinstance(pdf_source, str) else 'in memory'} (ID: {pdf_id})")
         
-        # Split into chunks - smaller chunks for better retrieval precision
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=512,
-            chunk_overlap=50
-        )
-        chunks = text_splitter.split_documents(documents)
-        
-        # Extract text content for batch processing
-        texts = [chunk.page_content for chunk in chunks]
-        logger.info(f"Split PDF into {len(chunks)} chunks")
+        # Read pages with pypdf and split each page's text, keeping the
+        # page number of every chunk in a parallel list
+        reader = PdfReader(pdf_source)
+        texts = []
+        pages = []
+        for page_number, page in enumerate(reader.pages):
+            for page_index, chunk in fast_split(page.extract_text() or "", page_number):
+                texts.append(chunk)
+                pages.append(page_index)
+        logger.info(f"Split PDF into {len(texts)} chunks")
         
         if not texts:
             logger.warning(f"No text extracted from PDF: {pdf_id}")
             return 0
         
-        # Generate embeddings in batch using Gemini API
-        embeddings = self.generate_embeddings(texts)
-        
-        # Prepare vectors for batch upload
-        vectors_to_upsert = []
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            vector_id = f"{pdf_id}-{i}"
-            metadata = {
-                "text": chunk.page_content,
-                "source": pdf_id,
-                "page": chunk.metadata.get("page", 0)
-            }
-            # vectors_to_upsert.append((vector_id, embedding, metadata))
-            vectors_to_upsert.append({
-                "id": vector_id,
-                "values": embedding,
-                "metadata": metadata
-            })
+        # Embed each distinct chunk once; repeated headers and footers reuse
+        # the embedding of their first occurrence
+        unique_positions = {}
+        unique_texts = []
+        chunk_to_unique = []
+        for text in texts:
+            key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            position = unique_positions.get(key)
+            if position is None:
+                position = unique_positions[key] = len(unique_texts)
+                unique_texts.append(text)
+            chunk_to_unique.append(position)
+        if len(unique_texts) < len(texts):
+            logger.info(f"Embedding {len(unique_texts)} unique chunks out of {len(texts)}")
+        
+        # Generate embeddings in batch using Gemini API and keep them as one array
+        unique_embeddings = np.asarray(self.generate_embeddings(unique_texts), dtype=np.float32)
+        embeddings = unique_embeddings[chunk_to_unique]
         
-        # Batch upsert to Pinecone (smaller batches to avoid rate limits on free tier)
-        batch_size = 50  # Reduced batch size for free tier
-        for i in range(0, len(vectors_to_upsert), batch_size):
-            batch = vectors_to_upsert[i:i + batch_size]
+        self._upsert_vectors(pdf_id, texts, pages, embeddings)
+        
+        logger.info(f"Successfully processed PDF: {pdf_id} with {len(texts)} chunks")
+        return len(texts)
+    
+    def handle_pdf(self, pdf_name: str, pdf_id: str) -> Dict[str, Any]:
+        """Download a PDF from GCS and process it.
+        
+        Args:
+            pdf_name: Name of the PDF blob in the GCS bucket
+            pdf_id: Unique ID for the PDF
+            
+        Returns:
+            Status message to publish on the pdf-processing-status topic
+        """
+        local_path = None
+        try:
+            # Download PDF from GCS
             try:
-                self.index.upsert(vectors=batch)
-                logger.info(f"Upserted batch {i//batch_size + 1}/{(len(vectors_to_upsert) + batch_size - 1)//batch_size}")
-                
-                # Add a small delay between batches to avoid rate limiting
-                if i + batch_size < len(vectors_to_upsert):
-                    time.sleep(0.5)
-                    
+                blob = self.bucket.get_blob(pdf_name)
+                if blob is None:
+                    raise FileNotFoundError(f"gs://{self.bucket_name}/{pdf_name} does not exist")
+                if blob.size > CHUNKED_DOWNLOAD_THRESHOLD:
+                    # Large PDFs: parallel range requests on threads within this
+                    # worker into a temporary file to avoid holding them in memory
+                    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+                        local_path = temp_file.name
+                    transfer_manager.download_chunks_concurrently(
+                        blob,
+                        local_path,
+                        chunk_size=CHUNKED_DOWNLOAD_CHUNK_SIZE,
+                        max_workers=CHUNKED_DOWNLOAD_WORKERS,
+                        worker_type=transfer_manager.THREAD
+                    )
+                    pdf_source = local_path
+                    logger.info(f"Downloaded PDF ({blob.size} bytes) to: {local_path}")
+                else:
+                    pdf_source = io.BytesIO()
+                    blob.download_to_file(pdf_source)
+                    pdf_source.seek(0)
+                    logger.info(f"Downloaded PDF ({blob.size} bytes) into memory")
             except Exception as e:
-                logger.error(f"Error upserting batch {i//batch_size + 1}: {str(e)}")
-                # If we hit a rate limit, wait longer and retry with smaller batch
-                if "limit" in str(e).lower():
-                    logger.info("Rate limit hit, waiting 5 seconds before retrying")
-                    time.sleep(5)
-                    # Try with smaller batches
-                    smaller_batch_size = max(10, batch_size // 2)
-                    for j in range(i, min(i + batch_size, len(vectors_to_upsert)), smaller_batch_size):
-                        smaller_batch = vectors_to_upsert[j:j + smaller_batch_size]
-                        try:
-                            self.index.upsert(vectors=smaller_batch)
-                            logger.info(f"Upserted smaller batch {j//smaller_batch_size + 1}")
-                            time.sleep(1)  # Wait longer between smaller batches
-                        except Exception as retry_error:
-                            logger.error(f"Failed retry for smaller batch: {str(retry_error)}")
+                logger.error(f"Failed to download PDF: {str(e)}")
+                return {
+                    "id": pdf_id,
+                    "status": "failed",
+                    "error": f"Failed to download PDF: {str(e)}"
+                }
+            
+            try:
+                # Process PDF
+                chunks_processed = self.process_pdf(pdf_source, pdf_id)
+                logger.info(f"Successfully processed {chunks_processed} chunks from {pdf_name}")
+                return {
+                    "id": pdf_id,
+                    "status": "completed",
+                    "chunks_processed": chunks_processed
+                }
+            except Exception as e:
+                error_msg = f"Failed to process {pdf_name}: {str(e)}"
+                logger.error(error_msg)
+                return {
+                    "id": pdf_id,
+                    "status": "failed",
+                    "error": error_msg
+                }
+        finally:
+            # Clean up
+            if local_path and os.path.exists(local_path):
+                os.remove(local_path)
+                logger.debug(f"Removed temporary file: {local_path}")
+    
+    def _create_executor(self) -> ProcessPoolExecutor:
+        """Create the pool of worker processes that process PDFs."""
+        # Spawn rather than fork: gRPC and HTTP clients are not fork-safe
+        executor = ProcessPoolExecutor(
+            max_workers=WORKER_COUNT,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker,
+            initargs=(self.shared_limiter,)
+        )
+        logger.info(f"Started pool of {WORKER_COUNT} worker processes")
+        return executor
+    
+    def _as_completed(self, futures):
+        """Yield futures as they complete, polling the consumer in between.
+        
+        A batch can take far longer than max.poll.interval.ms, so the consumer
+        keeps polling its paused partitions to stay in the consumer group.
+        """
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=KEEPALIVE_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            yield from done
+            self._poll_while_paused()
+    
+    def _poll_while_paused(self):
+        """Poll the consumer without taking new work.
+        
+        The assigned partitions are paused, but partitions assigned by a
+        rebalance during the batch are not. Their messages are rewound and
+        the partitions paused, so they are consumed with the next batch.
+        """
+        first_offsets = {}
+        for message in self.consumer.consume(num_messages=CONSUME_BATCH_SIZE, timeout=0):
+            if message.error():
+                continue
+            first_offsets.setdefault((message.topic(), message.partition()), message.offset())
         
-        logger.info(f"Successfully processed PDF: {pdf_id} with {len(chunks)} chunks")
-        return len(chunks)
+        if first_offsets:
+            partitions = [
+                TopicPartition(topic, partition, offset)
+                for (topic, partition), offset in first_offsets.items()
+            ]
+            for partition in partitions:
+                self.consumer.seek(partition)
+            self.consumer.pause(partitions)
+    
+    def _run_in_pool(self, pdfs: List[Tuple[str, str]], positions: List[int]) -> List[int]:
+        """Process the given PDFs in the worker pool and send their status messages.
+        
+        Returns:
+            Positions of PDFs interrupted because a worker process died. The pool
+            has been rebuilt if this is not empty.
+        """
+        futures = {}
+        interrupted = []
+        for position in positions:
+            try:
+                futures[self.executor.submit(process_pdf_message, *pdfs[position])] = position
+            except BrokenProcessPool:
+                interrupted.append(position)
+        
+        for future in self._as_completed(futures):
+            position = futures[future]
+            pdf_name, pdf_id = pdfs[position]
+            try:
+                status = future.result()
+            except BrokenProcessPool:
+                interrupted.append(position)
+                continue
+            except WorkerInitializationError:
+                # Misconfiguration or an outage, not a problem with this PDF:
+                # stop without committing so the batch is replayed
+                raise
+            except Exception as e:
+                error_msg = f"Failed to process {pdf_name}: {str(e)}"
+                logger.error(error_msg)
+                status = {
+                    "id": pdf_id,
+                    "status": "failed",
+                    "error": error_msg
+                }
+            self._send_status(status)
+        
+        if interrupted:
+            logger.error(f"Worker process died; rebuilding the pool for {len(interrupted)} interrupted PDFs")
+            self.executor.shutdown(wait=True)
+            self.executor = self._create_executor()
+        return interrupted
+    
+    def _process_pdfs(self, pdfs: List[Tuple[str, str]]):
+        """Process PDFs in the worker pool and send a status message for each.
+        
+        A worker process dying (e.g. out of memory) breaks the whole pool and
+        interrupts every PDF in flight. Interrupted PDFs are retried one at a
+        time, so only a PDF that keeps killing its worker is reported as failed
+        after MAX_PDF_ATTEMPTS attempts.
+        
+        Args:
+            pdfs: (pdf_name, pdf_id) of each PDF to process
+        """
+        interrupted = self._run_in_pool(pdfs, list(range(len(pdfs))))
+        for position in interrupted:
+            for attempt in range(1, MAX_PDF_ATTEMPTS + 1):
+                if not self._run_in_pool(pdfs, [position]):
+                    break
+            else:
+                pdf_name, pdf_id = pdfs[position]
+                error_msg = f"Failed to process {pdf_name}: worker process died {MAX_PDF_ATTEMPTS} times"
+                logger.error(error_msg)
+                self._send_status({
+                    "id": pdf_id,
+                    "status": "failed",
+                    "error": error_msg
+                })
     
     def run(self):
-        """Main processing loop that consumes Kafka messages and processes PDFs."""
+        """Main processing loop that consumes Kafka messages and processes PDFs.
+        
+        Each PDF in a polled batch is handed to a worker process. Offsets are only
+        committed once every message in the batch has a status and it was sent.
+        """
         logger.info("PDF processor starting up...")
-        logger.info("Waiting for messages...")
         
-        while True:
-            # Poll for messages with timeout
-            message_batch = self.consumer.poll(timeout_ms=1000)
+        # One rate limiter for all workers, since the Gemini quotas are per API key
+        limiter_manager = _RateLimiterManager(ctx=multiprocessing.get_context("spawn"))
+        limiter_manager.start()
+        self.shared_limiter = limiter_manager.RateLimiter(GEMINI_RPM, GEMINI_TPM)
+        
+        self.executor = self._create_executor()
+        try:
+            logger.info("Waiting for messages...")
             
-            if not message_batch:
-                continue
+            while True:
+                # Poll for messages with timeout
+                messages = self.consumer.consume(num_messages=CONSUME_BATCH_SIZE, timeout=1.0)
                 
-            for topic_partition, messages in message_batch.items():
+                if not messages:
+                    continue
+                
+                pdfs = []
+                next_offsets = {}
                 for message in messages:
+                    if message.error():
+                        logger.error(f"Kafka consumer error: {message.error()}")
+                        continue
                     try:
-                        pdf_info = message.value
+                        pdf_info = orjson.loads(message.value())
                         pdf_name = pdf_info.get("filename")
                         pdf_id = pdf_info.get("id")
                         
                         logger.info(f"Received message for PDF: {pdf_name} (ID: {pdf_id})")
-                        
-                        # Create a temporary file to store the downloaded PDF
-                        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                            local_path = temp_file.name
-                            
-                            # Download PDF from GCS
-                            try:
-                                blob = self.bucket.blob(pdf_name)
-                                blob.download_to_filename(local_path)
-                                logger.info(f"Downloaded PDF to: {local_path}")
-                            except Exception as e:
-                                logger.error(f"Failed to download PDF: {str(e)}")
-                                self.producer.send('pdf-processing-status', {
-                                    "id": pdf_id,
-                                    "status": "failed",
-                                    "error": f"Failed to download PDF: {str(e)}"
-                                })
-                                continue
-                        
-                        try:
-                            # Process PDF
-                            chunks_processed = self.process_pdf(local_path, pdf_id)
-                            
-                            # Send success message
-                            self.producer.send('pdf-processing-status', {
-                                "id": pdf_id,
-                                "status": "completed",
-                                "chunks_processed": chunks_processed
-                            })
-                            logger.info(f"Successfully processed {chunks_processed} chunks from {pdf_name}")
-                            
-                        except Exception as e:
-                            # Send failure message
-                            error_msg = f"Failed to process {pdf_name}: {str(e)}"
-                            logger.error(error_msg)
-                            self.producer.send('pdf-processing-status', {
-                                "id": pdf_id,
-                                "status": "failed",
-                                "error": error_msg
-                            })
-                            
-                        finally:
-                            # Clean up
-                            if os.path.exists(local_path):
-                                os.remove(local_path)
-                                logger.debug(f"Removed temporary file: {local_path}")
-                                
+                        pdfs.append((pdf_name, pdf_id))
                     except Exception as e:
-                        logger.error(f"Error processing message: {str(e)}")
+                        # Malformed messages can never be processed; report them
+                        # so their offset can be committed
+                        error_msg = f"Invalid message at offset {message.offset()}: {str(e)}"
+                        logger.error(error_msg)
+                        self._send_status({
+                            "id": None,
+                            "status": "failed",
+                            "error": error_msg
+                        })
+                    next_offsets[(message.topic(), message.partition())] = message.offset() + 1
+                
+                # Returns only once every PDF has a status; the consumer is
+                # polled meanwhile with its partitions paused
+                self.consumer.pause(self.consumer.assignment())
+                try:
+                    self._process_pdfs(pdfs)
+                finally:
+                    self.consumer.resume(self.consumer.assignment())
+                
+                # Every message in the batch has a status by now; commit past the
+                # last message of each partition once the statuses are delivered
+                self.producer.flush()
+                if next_offsets:
+                    try:
+                        self.consumer.commit(offsets=[
+                            TopicPartition(topic, partition, offset)
+                            for (topic, partition), offset in next_offsets.items()
+                        ], asynchronous=False)
+                    except KafkaException as e:
+                        # Typically a rebalance moved the partitions during the
+                        # batch; their new owner will process the messages again
+                        logger.warning(f"Failed to commit offsets, batch will be redelivered: {e}")
+        finally:
+            self.executor.shutdown(wait=False)
+            limiter_manager.shutdown()
+
+
+def _delivery_report(err, msg):
+    """Log status messages that could not be delivered."""
+    if err is not None:
+        logger.error(f"Failed to deliver status message to {msg.topic()}: {err}")
 
-            # Commit offsets
-            self.consumer.commit()
+
+class WorkerInitializationError(RuntimeError):
+    """Raised when a worker process could not create its clients."""
+
+
+# Per-process PDF processor used by worker processes, or the error that
+# prevented creating it
+_worker_processor = None
+_worker_initialization_error = None
+
+
+def _initialize_worker(limiter: _RateLimiter):
+    """Create the clients used by a worker process.
+    
+    Args:
+        limiter: Proxy for the Gemini rate limiter shared by all workers
+    """
+    global _worker_processor, _worker_initialization_error
+    # Raising here would break the whole pool, so the error is reported by
+    # the first PDF this worker receives instead
+    try:
+        _worker_processor = PDFProcessor(with_kafka=False, limiter=limiter)
+    except Exception as e:
+        logger.error(f"Failed to initialize worker process: {str(e)}")
+        _worker_initialization_error = str(e)
+
+
+def process_pdf_message(pdf_name: str, pdf_id: str) -> Dict[str, Any]:
+    """Download and process a single PDF inside a worker process.
+    
+    Args:
+        pdf_name: Name of the PDF blob in the GCS bucket
+        pdf_id: Unique ID for the PDF
+        
+    Returns:
+        Status message to publish on the pdf-processing-status topic
+    """
+    if _worker_processor is None:
+        raise WorkerInitializationError(f"Worker process could not initialize: {_worker_initialization_error}")
+    return _worker_processor.handle_pdf(pdf_name, pdf_id)
 
 
 if __name__ == "__main__":